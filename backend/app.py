@@ -1,50 +1,362 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
 from flask_jwt_extended import (
     JWTManager, create_access_token, create_refresh_token,
     jwt_required, get_jwt_identity, get_jwt
 )
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.exceptions import HTTPException
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from pydantic import BaseModel, Field, StringConstraints, ValidationError, field_validator
 from datetime import timedelta, datetime
-import sqlite3
-import json
+from typing import Annotated, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+import hashlib
+import inspect
+import queue
+import threading
+import time
+import apsw
+import orjson
 import os
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Serialize responses with orjson instead of the stdlib json module"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that remembers recently verified tokens.
+
+    Decoded payloads are kept in a small LRU keyed by a blake2b digest of the
+    raw token, so repeated requests with the same token skip signature
+    verification until the token expires. Blocklist and token type checks
+    still run on every request, but cache hits skip decode_key_loader, so
+    clear_token_cache() must be called whenever tokens are revoked or the
+    signing key is rotated.
+
+    This hooks JWTManager._decode_jwt_from_config, a private method of
+    Flask-JWT-Extended 4.x; the constructor refuses to run if the installed
+    version does not provide it with the expected signature.
+    """
+
+    _DECODE_HOOK_PARAMS = ['self', 'encoded_token', 'csrf_value', 'allow_expired']
+
+    def __init__(self, app=None, cache_size=4096):
+        hook = getattr(JWTManager, '_decode_jwt_from_config', None)
+        if hook is None or list(inspect.signature(hook).parameters) != self._DECODE_HOOK_PARAMS:
+            raise RuntimeError(
+                'CachingJWTManager requires JWTManager._decode_jwt_from_config'
+                '(encoded_token, csrf_value, allow_expired) from Flask-JWT-Extended 4.x'
+            )
+        self._token_cache = OrderedDict()
+        self._token_cache_size = cache_size
+        self._token_cache_lock = threading.Lock()
+        super().__init__(app)
+
+    def clear_token_cache(self):
+        """Forget every cached token; call after revoking tokens or rotating keys"""
+        with self._token_cache_lock:
+            self._token_cache.clear()
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = hashlib.blake2b(encoded_token.encode(), digest_size=16).digest()
+        with self._token_cache_lock:
+            decoded = self._token_cache.get(key)
+            if decoded is not None:
+                if 'exp' not in decoded or decoded['exp'] > time.time():
+                    self._token_cache.move_to_end(key)
+                    return decoded
+                del self._token_cache[key]
+
+        # Cache miss or expired: verify normally (raises on invalid tokens)
+        decoded = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        with self._token_cache_lock:
+            self._token_cache[key] = decoded
+            if len(self._token_cache) > self._token_cache_size:
+                self._token_cache.popitem(last=False)
+        return decoded
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Configuration
 app.config['JWT_SECRET_KEY'] = 'your-secret-key-change-this-in-production'  # Change this!
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
 app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
 
+# Response compression (brotli when the client accepts it, otherwise gzip).
+# Streamed responses such as GET /api/tasks pick from their own algorithm
+# list and are compressed regardless of COMPRESS_MIN_SIZE, which only
+# applies to buffered responses.
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_ALGORITHM_STREAMING'] = ['br', 'gzip']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 500
+
 # Enable CORS for frontend communication
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+# Compress JSON responses
+Compress(app)
+
 # Initialize JWT
-jwt = JWTManager(app)
+jwt = CachingJWTManager(app)
+
+# Password hashing (Argon2id, OWASP recommended memory cost of 46 MiB)
+ph = PasswordHasher(time_cost=3, memory_cost=46 * 1024, parallelism=1)
+
+# Verified against when the username does not exist, so unknown and known
+# users take the same time to reject
+DUMMY_HASH = ph.hash(os.urandom(16).hex())
+
+# Concurrent Argon2 hashes (46 MiB each) allowed per worker process. With
+# gunicorn.conf.py's one worker per core, the default of 1 keeps hashing to
+# about one per core; argon2 releases the GIL, so admitted hashes run in
+# parallel with other requests.
+HASH_SLOTS = threading.BoundedSemaphore(
+    max(1, int(os.environ.get('ZENITH_HASH_SLOTS', 1)))
+)
 
 # Database configuration
 DATABASE = 'zenith.db'
+DB_POOL_SIZE = int(os.environ.get('ZENITH_DB_POOL_SIZE', 8))
+DB_STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+DB_BUSY_TIMEOUT_MS = 5000  # Wait for a competing writer instead of failing
+TASKS_FETCH_SIZE = 256  # Rows read and streamed per batch by get_tasks
+# Largest batch accepted by /api/tasks/bulk; each batch is one write
+# transaction, so this bounds how long other writers wait on the lock
+TASKS_BULK_MAX = 500
+
+# Per-connection settings, applied once when a pooled connection is opened
+DB_PRAGMAS = '''
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA cache_size = -65536;
+    PRAGMA mmap_size = 268435456;
+    PRAGMA temp_store = MEMORY;
+'''
+
+# Index backing the per-user task queries; username/email lookups already
+# use the indexes SQLite creates for their UNIQUE constraints
+DB_INDEXES = '''
+    CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks(user_id, created_at DESC);
+'''
+
+# Idle connections kept open between requests
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
 
 # ================================
 # DATABASE HELPER FUNCTIONS
 # ================================
 
-def get_db():
-    """Create database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+def _dict_row(cursor, row):
+    """Row tracer returning rows as dictionaries keyed by column name"""
+    return dict(zip((column for column, _ in cursor.get_description()), row))
+
+def _connect():
+    """Open a new database connection with the pool's pragmas applied"""
+    conn = apsw.Connection(DATABASE, statementcachesize=DB_STATEMENT_CACHE_SIZE)
+    conn.set_busy_timeout(DB_BUSY_TIMEOUT_MS)
+    conn.row_trace = _dict_row  # Return rows as dictionaries
+    # Some pragmas return a row, so step through the whole script
+    conn.execute(DB_PRAGMAS).fetchall()
     return conn
 
+@contextmanager
+def get_db():
+    """Borrow a pooled database connection for the duration of a block"""
+    try:
+        conn = _db_pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+    finally:
+        try:
+            _db_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
 def init_db():
     """Initialize database with tables"""
     with app.app_context():
-        db = get_db()
-        with app.open_resource('schema.sql', mode='r') as f:
-            db.cursor().executescript(f.read())
-        db.commit()
+        db = _connect()
+        try:
+            with app.open_resource('schema.sql', mode='r') as f:
+                with db:
+                    db.execute(f.read())
+        finally:
+            db.close()
         print('✓ Database initialized successfully')
+    create_indexes()
+
+def create_indexes():
+    """Create missing indexes and refresh planner statistics where stale"""
+    db = _connect()
+    try:
+        with db:
+            db.execute(DB_INDEXES)
+        # 0x10000 makes optimize consider every table, not only those this
+        # fresh connection has queried (the default before SQLite 3.46)
+        db.execute('PRAGMA optimize=0x10002')
+    finally:
+        db.close()
+
+def setup_db():
+    """Create the database on first run, otherwise bring its indexes up to date"""
+    if not os.path.exists(DATABASE):
+        init_db()
+    else:
+        create_indexes()
+
+@app.cli.command('setup-db')
+def setup_db_command():
+    """Create or migrate the database"""
+    setup_db()
+
+def verify_password(password_hash, password):
+    """Check a password against its stored hash.
+
+    Returns a (valid, new_hash) tuple; new_hash is set when the stored hash
+    should be replaced, either because it is a legacy werkzeug hash or
+    because the Argon2 parameters have changed since it was created.
+    A corrupt or unrecognised stored hash counts as a failed check.
+    """
+    if not password_hash.startswith('$argon2'):
+        # Legacy pbkdf2 hash from werkzeug, upgraded on successful login
+        try:
+            valid = check_password_hash(password_hash, password)
+        except ValueError:
+            valid = False
+        if not valid:
+            return False, None
+        return True, ph.hash(password)
+
+    try:
+        ph.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False, None
+
+    if ph.check_needs_rehash(password_hash):
+        return True, ph.hash(password)
+    return True, None
+
+def task_to_dict(task):
+    """Convert a task row to a response dict.
+
+    The tags and subtasks columns already hold valid JSON written by this
+    API, so they are spliced into the response verbatim instead of being
+    decoded here only to be encoded again by jsonify.
+    """
+    task_dict = dict(task)
+    task_dict['tags'] = orjson.Fragment(task['tags'] or '[]')
+    task_dict['subtasks'] = orjson.Fragment(task['subtasks'] or '[]')
+    return task_dict
+
+def task_row_to_json(cursor, task):
+    """Row tracer serializing a get_tasks row straight to JSON bytes"""
+    return orjson.dumps({
+        'id': task[0],
+        'title': task[1],
+        'description': task[2],
+        'status': task[3],
+        'priority': task[4],
+        'due_date': task[5],
+        'tags': orjson.Fragment(task[6] or '[]'),
+        'subtasks': orjson.Fragment(task[7] or '[]'),
+        'created_at': task[8],
+        'updated_at': task[9]
+    })
+
+def insert_tasks(db, user_id, tasks):
+    """Insert validated tasks for a user in one transaction and return the new rows"""
+    with db:
+        return list(db.cursor().executemany(
+            '''INSERT INTO tasks (user_id, title, description, status, priority,
+                                due_date, tags, subtasks)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               RETURNING id, user_id, title, description, status, priority,
+                         due_date, tags, subtasks, created_at, updated_at''',
+            [
+                (
+                    user_id, task.title, task.description or None, task.status,
+                    task.priority, task.due_date,
+                    orjson.dumps(task.tags).decode(), orjson.dumps(task.subtasks).decode()
+                )
+                for task in tasks
+            ]
+        ))
+
+# ================================
+# REQUEST SCHEMAS
+# ================================
+
+StrippedStr = Annotated[str, StringConstraints(strip_whitespace=True)]
+RequiredStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
+class RegisterIn(BaseModel):
+    username: Annotated[str, StringConstraints(strip_whitespace=True, min_length=3)]
+    email: RequiredStr
+    password: Annotated[str, StringConstraints(min_length=6)]
+
+class LoginIn(BaseModel):
+    username: RequiredStr
+    password: Annotated[str, StringConstraints(min_length=1)]
+
+class TaskIn(BaseModel):
+    title: RequiredStr
+    description: Optional[StrippedStr] = None
+    status: str = 'todo'
+    priority: str = 'medium'
+    due_date: Optional[str] = Field(None, alias='dueDate')
+    tags: list = []
+    subtasks: list = []
+
+class TaskBulkIn(BaseModel):
+    tasks: list[TaskIn] = Field(min_length=1, max_length=TASKS_BULK_MAX)
+
+class TaskUpdate(BaseModel):
+    """Partial task update; only fields present in the request are set.
+
+    Field names match the tasks table columns. Only description and
+    dueDate may be cleared with an explicit null.
+    """
+    title: Optional[RequiredStr] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    due_date: Optional[str] = Field(None, alias='dueDate')
+    tags: Optional[list] = None
+    subtasks: Optional[list] = None
+
+    @field_validator('title', 'status', 'priority', 'tags', 'subtasks')
+    @classmethod
+    def reject_null(cls, value):
+        if value is None:
+            raise ValueError('may not be null')
+        return value
 
 # ================================
 # AUTHENTICATION ENDPOINTS
@@ -53,97 +365,82 @@ def init_db():
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new user"""
-    try:
-        data = request.get_json()
-        
-        # Validate input
-        username = data.get('username', '').strip()
-        email = data.get('email', '').strip()
-        password = data.get('password', '')
-        
-        if not username or not email or not password:
-            return jsonify({'error': 'All fields are required'}), 400
-        
-        if len(username) < 3:
-            return jsonify({'error': 'Username must be at least 3 characters'}), 400
-        
-        if len(password) < 6:
-            return jsonify({'error': 'Password must be at least 6 characters'}), 400
-        
-        # Hash password
-        password_hash = generate_password_hash(password)
-        
-        # Insert into database
-        db = get_db()
+    payload = RegisterIn.model_validate(request.get_json())
+    username = payload.username
+    email = payload.email
+    password = payload.password
+    
+    # Hash password
+    with HASH_SLOTS:
+        password_hash = ph.hash(password)
+    
+    # Insert into database
+    with get_db() as db:
         try:
-            cursor = db.execute(
+            db.execute(
                 'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
                 (username, email, password_hash)
             )
-            db.commit()
-            user_id = cursor.lastrowid
-            
-            # Create tokens
-            access_token = create_access_token(identity=user_id)
-            refresh_token = create_refresh_token(identity=user_id)
-            
-            return jsonify({
-                'message': 'User registered successfully',
-                'user': {
-                    'id': user_id,
-                    'username': username,
-                    'email': email
-                },
-                'access_token': access_token,
-                'refresh_token': refresh_token
-            }), 201
-            
-        except sqlite3.IntegrityError:
+            user_id = db.last_insert_rowid()
+        except apsw.ConstraintError:
             return jsonify({'error': 'Username or email already exists'}), 409
-        finally:
-            db.close()
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    
+    # Create tokens
+    access_token = create_access_token(identity=user_id)
+    refresh_token = create_refresh_token(identity=user_id)
+    
+    return jsonify({
+        'message': 'User registered successfully',
+        'user': {
+            'id': user_id,
+            'username': username,
+            'email': email
+        },
+        'access_token': access_token,
+        'refresh_token': refresh_token
+    }), 201
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     """Login user and return JWT tokens"""
-    try:
-        data = request.get_json()
-        username = data.get('username', '').strip()
-        password = data.get('password', '')
-        
-        if not username or not password:
-            return jsonify({'error': 'Username and password required'}), 400
-        
-        db = get_db()
+    payload = LoginIn.model_validate(request.get_json())
+    username = payload.username
+    password = payload.password
+    
+    with get_db() as db:
         user = db.execute(
             'SELECT * FROM users WHERE username = ?',
             (username,)
         ).fetchone()
-        db.close()
-        
-        if not user or not check_password_hash(user['password_hash'], password):
-            return jsonify({'error': 'Invalid username or password'}), 401
-        
-        # Create tokens
-        access_token = create_access_token(identity=user['id'])
-        refresh_token = create_refresh_token(identity=user['id'])
-        
-        return jsonify({
-            'message': 'Login successful',
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email']
-            },
-            'access_token': access_token,
-            'refresh_token': refresh_token
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    
+    with HASH_SLOTS:
+        valid, new_hash = verify_password(
+            user['password_hash'] if user else DUMMY_HASH, password
+        )
+    if not (valid and user):
+        return jsonify({'error': 'Invalid username or password'}), 401
+    
+    if new_hash:
+        with get_db() as db:
+            db.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ?',
+                (new_hash, user['id'])
+            )
+    
+    # Create tokens
+    access_token = create_access_token(identity=user['id'])
+    refresh_token = create_refresh_token(identity=user['id'])
+    
+    return jsonify({
+        'message': 'Login successful',
+        'user': {
+            'id': user['id'],
+            'username': user['username'],
+            'email': user['email']
+        },
+        'access_token': access_token,
+        'refresh_token': refresh_token
+    }), 200
 
 @app.route('/api/auth/refresh', methods=['POST'])
 @jwt_required(refresh=True)
@@ -157,27 +454,22 @@ def refresh():
 @jwt_required()
 def get_current_user():
     """Get current user info"""
-    try:
-        user_id = get_jwt_identity()
-        db = get_db()
+    user_id = get_jwt_identity()
+    with get_db() as db:
         user = db.execute(
             'SELECT id, username, email, created_at FROM users WHERE id = ?',
             (user_id,)
         ).fetchone()
-        db.close()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify({
-            'id': user['id'],
-            'username': user['username'],
-            'email': user['email'],
-            'created_at': user['created_at']
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify({
+        'id': user['id'],
+        'username': user['username'],
+        'email': user['email'],
+        'created_at': user['created_at']
+    }), 200
 
 # ================================
 # TASK CRUD ENDPOINTS
@@ -187,165 +479,151 @@ def get_current_user():
 @jwt_required()
 def get_tasks():
     """Get all tasks for current user"""
-    try:
-        user_id = get_jwt_identity()
-        db = get_db()
-        
-        tasks = db.execute(
-            '''SELECT id, title, description, status, priority, due_date,
-                      tags, subtasks, created_at, updated_at
-               FROM tasks WHERE user_id = ?
-               ORDER BY created_at DESC''',
-            (user_id,)
-        ).fetchall()
-        db.close()
-        
-        # Convert to list of dictionaries
-        tasks_list = []
-        for task in tasks:
-            task_dict = dict(task)
-            # Parse JSON fields
-            task_dict['tags'] = json.loads(task_dict['tags']) if task_dict['tags'] else []
-            task_dict['subtasks'] = json.loads(task_dict['subtasks']) if task_dict['subtasks'] else []
-            tasks_list.append(task_dict)
-        
-        return jsonify({'tasks': tasks_list}), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    
+    def generate():
+        # Stream the {"tasks": [...]} document one batch of rows at a time
+        with get_db() as db:
+            # Rows are serialized as they are stepped, never built as dicts
+            cursor = db.cursor()
+            cursor.row_trace = task_row_to_json
+            cursor.execute(
+                '''SELECT id, title, description, status, priority, due_date,
+                          tags, subtasks, created_at, updated_at
+                   FROM tasks WHERE user_id = ?
+                   ORDER BY created_at DESC''',
+                (user_id,)
+            )
+            yield b'{"tasks":['
+            separator = b''
+            while tasks := list(islice(cursor, TASKS_FETCH_SIZE)):
+                yield separator + b','.join(tasks)
+                separator = b','
+            yield b']}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json'), 200
 
 @app.route('/api/tasks', methods=['POST'])
 @jwt_required()
 def create_task():
     """Create a new task"""
-    try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        title = data.get('title', '').strip()
-        if not title:
-            return jsonify({'error': 'Title is required'}), 400
-        
-        # Extract task data
-        description = data.get('description', '').strip() or None
-        status = data.get('status', 'todo')
-        priority = data.get('priority', 'medium')
-        due_date = data.get('dueDate')
-        tags = json.dumps(data.get('tags', []))
-        subtasks = json.dumps(data.get('subtasks', []))
-        
-        db = get_db()
-        cursor = db.execute(
-            '''INSERT INTO tasks (user_id, title, description, status, priority,
-                                due_date, tags, subtasks)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-            (user_id, title, description, status, priority, due_date, tags, subtasks)
-        )
-        db.commit()
-        task_id = cursor.lastrowid
-        
-        # Fetch the created task
-        task = db.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
-        db.close()
-        
-        task_dict = dict(task)
-        task_dict['tags'] = json.loads(task_dict['tags']) if task_dict['tags'] else []
-        task_dict['subtasks'] = json.loads(task_dict['subtasks']) if task_dict['subtasks'] else []
-        
-        return jsonify({
-            'message': 'Task created successfully',
-            'task': task_dict
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    payload = TaskIn.model_validate(request.get_json())
+    
+    with get_db() as db:
+        task = insert_tasks(db, user_id, [payload])[0]
+    
+    return jsonify({
+        'message': 'Task created successfully',
+        'task': task_to_dict(task)
+    }), 201
+
+@app.route('/api/tasks/bulk', methods=['POST'])
+@jwt_required()
+def create_tasks_bulk():
+    """Create up to TASKS_BULK_MAX tasks in one request"""
+    user_id = get_jwt_identity()
+    payload = TaskBulkIn.model_validate(request.get_json())
+    
+    with get_db() as db:
+        tasks = insert_tasks(db, user_id, payload.tasks)
+    
+    return jsonify({
+        'message': f'{len(tasks)} tasks created successfully',
+        'tasks': [task_to_dict(task) for task in tasks]
+    }), 201
 
 @app.route('/api/tasks/<int:task_id>', methods=['PUT'])
 @jwt_required()
 def update_task(task_id):
     """Update an existing task"""
-    try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        db = get_db()
-        
-        # Verify task belongs to user
-        task = db.execute(
-            'SELECT * FROM tasks WHERE id = ? AND user_id = ?',
-            (task_id, user_id)
+    user_id = get_jwt_identity()
+    payload = TaskUpdate.model_validate(request.get_json())
+    
+    # Only the fields sent by the client are changed; the stored JSON of
+    # untouched tags/subtasks is neither read nor re-encoded. Fields are read
+    # straight off the model (model_dump would deep-copy the lists) in
+    # declaration order, so each field combination yields the same SQL text.
+    updates = {
+        column: getattr(payload, column)
+        for column in TaskUpdate.model_fields if column in payload.model_fields_set
+    }
+    for column in ('tags', 'subtasks'):
+        if column in updates:
+            updates[column] = orjson.dumps(updates[column]).decode()
+    assignments = ''.join(f'{column} = ?, ' for column in updates)
+    
+    with get_db() as db:
+        # The ownership check is part of the UPDATE itself
+        updated_task = db.execute(
+            f'''UPDATE tasks
+                SET {assignments}updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND user_id = ?
+                RETURNING id, user_id, title, description, status, priority,
+                          due_date, tags, subtasks, created_at, updated_at''',
+            (*updates.values(), task_id, user_id)
         ).fetchone()
-        
-        if not task:
-            db.close()
-            return jsonify({'error': 'Task not found'}), 404
-        
-        # Update task
-        title = data.get('title', task['title'])
-        description = data.get('description', task['description'])
-        status = data.get('status', task['status'])
-        priority = data.get('priority', task['priority'])
-        due_date = data.get('dueDate', task['due_date'])
-        tags = json.dumps(data.get('tags', json.loads(task['tags'] or '[]')))
-        subtasks = json.dumps(data.get('subtasks', json.loads(task['subtasks'] or '[]')))
-        
-        db.execute(
-            '''UPDATE tasks
-               SET title = ?, description = ?, status = ?, priority = ?,
-                   due_date = ?, tags = ?, subtasks = ?, updated_at = CURRENT_TIMESTAMP
-               WHERE id = ? AND user_id = ?''',
-            (title, description, status, priority, due_date, tags, subtasks, task_id, user_id)
-        )
-        db.commit()
-        
-        # Fetch updated task
-        updated_task = db.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
-        db.close()
-        
-        task_dict = dict(updated_task)
-        task_dict['tags'] = json.loads(task_dict['tags']) if task_dict['tags'] else []
-        task_dict['subtasks'] = json.loads(task_dict['subtasks']) if task_dict['subtasks'] else []
-        
-        return jsonify({
-            'message': 'Task updated successfully',
-            'task': task_dict
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    
+    if updated_task is None:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    return jsonify({
+        'message': 'Task updated successfully',
+        'task': task_to_dict(updated_task)
+    }), 200
 
 @app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 @jwt_required()
 def delete_task(task_id):
     """Delete a task"""
-    try:
-        user_id = get_jwt_identity()
-        db = get_db()
-        
-        # Verify task belongs to user
-        task = db.execute(
-            'SELECT * FROM tasks WHERE id = ? AND user_id = ?',
+    user_id = get_jwt_identity()
+    with get_db() as db:
+        # The ownership check is part of the DELETE itself
+        db.execute(
+            'DELETE FROM tasks WHERE id = ? AND user_id = ?',
             (task_id, user_id)
-        ).fetchone()
-        
-        if not task:
-            db.close()
-            return jsonify({'error': 'Task not found'}), 404
-        
-        db.execute('DELETE FROM tasks WHERE id = ? AND user_id = ?', (task_id, user_id))
-        db.commit()
-        db.close()
-        
-        return jsonify({'message': 'Task deleted successfully'}), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        )
+        deleted = db.changes()
+    
+    if deleted == 0:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    return jsonify({'message': 'Task deleted successfully'}), 200
 
 # ================================
 # ERROR HANDLERS
 # ================================
 
+@app.errorhandler(HTTPException)
+def http_error_callback(error):
+    # Keep the exception's own headers (Allow, WWW-Authenticate, ...)
+    response = error.get_response()
+    response.data = app.json.dumps({'error': error.description})
+    response.content_type = 'application/json'
+    return response
+
+@app.errorhandler(ValidationError)
+def validation_error_callback(error):
+    details = [
+        {
+            'field': '.'.join(str(part) for part in err['loc']),
+            'message': err['msg']
+        }
+        for err in error.errors(include_url=False)
+    ]
+    first = details[0]
+    message = f"{first['field']}: {first['message']}" if first['field'] else first['message']
+    return jsonify({'error': message, 'details': details}), 400
+
+@app.errorhandler(apsw.ConstraintError)
+def integrity_error_callback(error):
+    return jsonify({'error': 'Request conflicts with existing data'}), 409
+
+@app.errorhandler(500)
+def internal_error_callback(error):
+    # Unhandled exceptions are logged by Flask before this runs
+    return jsonify({'error': 'Internal server error'}), 500
+
 @jwt.expired_token_loader
 def expired_token_callback(jwt_header, jwt_payload):
     return jsonify({'error': 'Token has expired'}), 401
@@ -363,8 +641,7 @@ def missing_token_callback(error):
 # ================================
 
 if __name__ == '__main__':
-    # Initialize database if it doesn't exist
-    if not os.path.exists(DATABASE):
-        init_db()
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    setup_db()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
@@ -0,0 +1,25 @@
+# backend/gunicorn.conf.py
+# Production server settings, picked up by running `gunicorn app:app` from backend/
+import os
+import subprocess
+import sys
+
+bind = os.environ.get('ZENITH_BIND', '0.0.0.0:5000')
+
+# One process per core; threads let a worker overlap SQLite I/O and password
+# hashing, which both release the GIL
+workers = int(os.environ.get('ZENITH_WORKERS', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('ZENITH_THREADS', 4))
+
+
+def on_starting(server):
+    """Create or migrate the database once, before any worker is forked.
+
+    Runs in a separate process so the master never imports the app module;
+    workers import it fresh, and a HUP reload picks up new code.
+    """
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'setup-db'],
+        check=True
+    )